@@ -1,12 +1,18 @@
 """
 RcloneTray.py
 Tray monitor for rclone mount — always-on mode
+Launches the mount itself from named performance profiles (replaces the old VBS launchers)
 Requires: pip install pystray pillow psutil
 """
 
 import threading
 import subprocess
+import socket
+import tempfile
+import shutil
+import json
 import time
+import os
 
 import psutil
 import pystray
@@ -16,12 +22,81 @@ from PIL import Image, ImageDraw
 #  Config — adjust these to match your setup
 # ─────────────────────────────────────────────────────────────────────────────
 
+REMOTE            = "Cloud Volume:"
+MOUNT_POINT       = "Z:"
 RC_ADDR           = "127.0.0.1:7576"
 RC_USER           = "username"
 RC_PASS           = "password"
-REMOUNT_TASK_NAME = "RcloneRemount"  # Task Scheduler task name
 CHECK_INTERVAL    = 5    # seconds between auto-detect checks
-STARTUP_GRACE     = 40   # seconds to wait before first auto-detect
+NETWORK_HOST      = "rclone.org"  # resolved at startup to tell when the network is up
+NETWORK_TIMEOUT   = 60   # give up waiting for the network and try to mount anyway
+MOUNT_TIMEOUT     = 30   # seconds to wait for the drive letter after launching
+
+PROFILE_FILE      = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RcloneTray.profile")
+DEFAULT_PROFILE   = "default"
+
+# Flags shared by every profile
+COMMON_MOUNT_FLAGS = [
+    "--rc", "--rc-web-gui", "--rc-web-gui-no-open-browser",
+    f"--rc-addr={RC_ADDR}",
+    "--poll-interval=10m",
+    "--links",
+]
+
+# Named mount profiles — flag name (without --) → value
+MOUNT_PROFILES = {
+    # Same settings the old RcloneMaster.vbs used
+    "default": {
+        "vfs-cache-mode": "writes",
+        "vfs-read-ahead": "512M",
+        "buffer-size":    "512M",
+        "dir-cache-time": "1h",
+        "transfers":      4,
+        "checkers":       4,
+    },
+    # Watching video straight off the mount — cache whole files, read far ahead
+    "streaming": {
+        "vfs-cache-mode": "full",
+        "vfs-read-ahead": "1G",
+        "buffer-size":    "256M",
+        "dir-cache-time": "1h",
+        "transfers":      4,
+        "checkers":       4,
+    },
+    # Copying lots of files onto the mount — more parallel uploads, small read buffers.
+    # Mount-time flags match "default", so switching between the two is applied live.
+    "bulk-write": {
+        "vfs-cache-mode": "writes",
+        "vfs-read-ahead": "512M",
+        "buffer-size":    "32M",
+        "dir-cache-time": "1h",
+        "transfers":      8,
+        "checkers":       8,
+    },
+    # Keep rclone's footprint small, e.g. while gaming
+    "low-memory": {
+        "vfs-cache-mode": "minimal",
+        "vfs-read-ahead": "0",
+        "buffer-size":    "16M",
+        "dir-cache-time": "10m",
+        "transfers":      2,
+        "checkers":       2,
+    },
+}
+
+# Flags that can be changed on a running mount via RC options/set → (block, option).
+# Anything not listed here is baked into the VFS at mount time and needs a remount.
+LIVE_OPTIONS = {
+    "buffer-size": ("main", "BufferSize"),
+    "transfers":   ("main", "Transfers"),
+    "checkers":    ("main", "Checkers"),
+}
+
+# Benchmark workloads — point these at something that exists on your mount
+BENCH_DIR         = os.path.join(MOUNT_POINT + "\\", "Movies")  # folder tree for the directory-listing test
+BENCH_FILE        = os.path.join(BENCH_DIR, "sample.mkv")      # large file for the sequential-read test
+BENCH_READ_MB     = 256                                        # how much of BENCH_FILE to read
+BENCH_RESULTS     = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RcloneBench.txt")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -35,52 +110,122 @@ def make_icon(color: str) -> Image.Image:
     return img
 
 
-def is_rclone_running() -> bool:
-    for p in psutil.process_iter(["name"]):
+def mount_processes() -> list:
+    """rclone processes serving our mount — not uploads or other rclone commands."""
+    procs = []
+    for p in psutil.process_iter(["name", "cmdline"]):
         try:
             if p.info["name"] and p.info["name"].lower() == "rclone.exe":
-                return True
+                args = [a.lower() for a in p.info["cmdline"] or []]
+                if "mount" in args and MOUNT_POINT.lower() in args:
+                    procs.append(p)
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             pass
+    return procs
+
+
+def is_rclone_running() -> bool:
+    return bool(mount_processes())
+
+
+def load_profile() -> str:
+    """Last profile picked from the tray, or the default one."""
+    try:
+        with open(PROFILE_FILE, encoding="utf-8") as f:
+            name = f.read().strip()
+        if name in MOUNT_PROFILES:
+            return name
+    except OSError:
+        pass
+    return DEFAULT_PROFILE
+
+
+def save_profile(name: str):
+    try:
+        with open(PROFILE_FILE, "w", encoding="utf-8") as f:
+            f.write(name)
+    except OSError:
+        pass
+
+
+def build_mount_cmd(profile: str, cache_dir: str = None) -> list:
+    cmd = ["rclone", "mount", REMOTE, MOUNT_POINT]
+    cmd += COMMON_MOUNT_FLAGS
+    cmd += [f"--{flag}={value}" for flag, value in MOUNT_PROFILES[profile].items()]
+    if cache_dir:
+        cmd.append(f"--cache-dir={cache_dir}")
+    return cmd
+
+
+def rc_call(command: str, params: dict = None, timeout: int = 5) -> bool:
+    """Run `rclone rc <command>` against the mount's RC server. Returns True on success."""
+    cmd = ["rclone", "rc", command, f"--url=http://{RC_ADDR}/"]
+    if params:
+        cmd += ["--json", json.dumps(params)]
+    # Credentials via the environment (--user/--pass) so they stay out of process listings
+    env = dict(os.environ, RCLONE_USER=RC_USER, RCLONE_PASS=RC_PASS)
+    try:
+        result = subprocess.run(
+            cmd,
+            env=env,
+            creationflags=subprocess.CREATE_NO_WINDOW,
+            capture_output=True,
+            timeout=timeout
+        )
+        return result.returncode == 0
+    except Exception:
+        return False
+
+
+def wait_for_mount(present: bool = True, timeout: int = MOUNT_TIMEOUT) -> bool:
+    """Wait until the drive letter appears (or disappears)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.isdir(MOUNT_POINT + "\\") == present:
+            return True
+        time.sleep(1)
     return False
 
 
-def start_rclone():
-    """Trigger the RcloneRemount scheduled task — runs in user session so Z: mounts correctly."""
+def start_rclone(profile: str, cache_dir: str = None):
+    """Launch the mount directly with the given profile's flags."""
     if not is_rclone_running():
+        # RC credentials go through the environment rather than the command line
+        env = dict(os.environ, RCLONE_RC_USER=RC_USER, RCLONE_RC_PASS=RC_PASS)
         subprocess.Popen(
-            ["schtasks", "/run", "/tn", REMOUNT_TASK_NAME],
-            creationflags=subprocess.CREATE_NO_WINDOW,
+            build_mount_cmd(profile, cache_dir),
+            env=env,
+            creationflags=subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP,
         )
 
 
 def stop_rclone():
     if is_rclone_running():
         # Graceful quit via RC
-        try:
-            subprocess.run(
-                [
-                    "rclone", "rc", "core/quit",
-                    f"--rc-addr={RC_ADDR}",
-                    f"--rc-user={RC_USER}",
-                    f"--rc-pass={RC_PASS}",
-                ],
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                timeout=5
-            )
-        except Exception:
-            pass
+        rc_call("core/quit")
         time.sleep(3)
-        # Force kill any remaining rclone processes
-        for p in psutil.process_iter(["name"]):
+        # Force kill the mount if it's still there — leaves uploads alone
+        for p in mount_processes():
             try:
-                if p.info["name"] and p.info["name"].lower() == "rclone.exe":
-                    p.kill()
+                p.kill()
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
         time.sleep(2)
 
 
+def wait_for_network(stop_ev: threading.Event, timeout: int = NETWORK_TIMEOUT) -> bool:
+    """Wait until DNS resolves NETWORK_HOST, i.e. the network is usable after login."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.getaddrinfo(NETWORK_HOST, 443)
+            return True
+        except OSError:
+            if stop_ev.wait(1):
+                return False
+    return False
+
+
 def wait_for_port_free(port: int, timeout: int = 15):
     """Wait until port is no longer in use."""
     deadline = time.time() + timeout
@@ -92,6 +237,38 @@ def wait_for_port_free(port: int, timeout: int = 15):
         time.sleep(1)
 
 
+def bench_sequential_read(path: str, megabytes: int) -> str:
+    """Read the first `megabytes` of path in 1 MiB chunks, return throughput."""
+    if not os.path.isfile(path):
+        return "skipped (file not found)"
+    chunk = 1024 * 1024
+    total = 0
+    start = time.perf_counter()
+    with open(path, "rb", buffering=0) as f:
+        while total < megabytes * chunk:
+            data = f.read(chunk)
+            if not data:
+                break
+            total += len(data)
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    return f"{total / chunk / elapsed:.1f} MiB/s ({total // chunk} MiB in {elapsed:.1f}s)"
+
+
+def bench_dir_listing(path: str) -> str:
+    """Walk the folder tree twice — cold (after vfs/forget) and warm — and time both."""
+    if not os.path.isdir(path):
+        return "skipped (folder not found)"
+    rc_call("vfs/forget")
+    timings = []
+    for _ in range(2):
+        entries = 0
+        start = time.perf_counter()
+        for _, dirs, files in os.walk(path):
+            entries += len(dirs) + len(files)
+        timings.append(time.perf_counter() - start)
+    return f"{entries} entries — cold {timings[0]:.2f}s, warm {timings[1]:.2f}s"
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  Tray app
 # ─────────────────────────────────────────────────────────────────────────────
@@ -100,6 +277,13 @@ class RcloneTray:
     def __init__(self):
         self._lock    = threading.Lock()
         self._stop_ev = threading.Event()
+        self.profile  = load_profile()
+
+        profile_menu = pystray.Menu(*[
+            pystray.MenuItem(name, self._menu_profile(name),
+                             checked=self._profile_checked(name), radio=True)
+            for name in MOUNT_PROFILES
+        ])
 
         self.icon = pystray.Icon(
             "rclone_tray",
@@ -111,6 +295,9 @@ class RcloneTray:
                 pystray.MenuItem("Start Rclone",  self._menu_start),
                 pystray.MenuItem("Stop Rclone",   self._menu_stop),
                 pystray.Menu.SEPARATOR,
+                pystray.MenuItem("Profile",       profile_menu),
+                pystray.MenuItem("Benchmark Profiles", self._menu_benchmark),
+                pystray.Menu.SEPARATOR,
                 pystray.MenuItem("Exit",          self._menu_exit),
             )
         )
@@ -119,7 +306,7 @@ class RcloneTray:
 
     def _set_running(self):
         self.icon.icon  = make_icon("#32cd32")
-        self.icon.title = "Rclone: Running"
+        self.icon.title = f"Rclone: Running ({self.profile})"
 
     def _set_stopped(self):
         self.icon.icon  = make_icon("#ff4444")
@@ -143,8 +330,8 @@ class RcloneTray:
                 return
             self._set_busy()
             wait_for_port_free(int(RC_ADDR.split(":")[1]))
-            start_rclone()
-            time.sleep(5)  # give VBS time to start rclone
+            start_rclone(self.profile)
+            wait_for_mount()
             self._refresh_icon()
 
     def _do_stop(self):
@@ -155,6 +342,100 @@ class RcloneTray:
             stop_rclone()
             self._refresh_icon()
 
+    def _remount(self, cache_dir: str = None):
+        """Stop and relaunch with the current profile. Caller holds the lock."""
+        self._set_busy()
+        stop_rclone()
+        wait_for_mount(present=False)
+        wait_for_port_free(int(RC_ADDR.split(":")[1]))
+        start_rclone(self.profile, cache_dir)
+        wait_for_mount()
+        self._refresh_icon()
+
+    def _apply_profile(self, name: str) -> str:
+        """
+        Switch to profile `name`. Caller holds the lock.
+        Uses RC options/set when only live-changeable flags differ,
+        otherwise remounts. Returns a short description of what happened.
+        """
+        old, new = MOUNT_PROFILES[self.profile], MOUNT_PROFILES[name]
+        changed  = [flag for flag in new if new[flag] != old.get(flag)]
+        self.profile = name
+        save_profile(name)
+        # pystray only re-reads the radio `checked` state on an explicit update
+        self.icon.update_menu()
+
+        if not is_rclone_running():
+            return "applies on next start"
+        if not changed:
+            self._refresh_icon()
+            return "no changes"
+
+        if all(flag in LIVE_OPTIONS for flag in changed):
+            params = {}
+            for flag in changed:
+                block, option = LIVE_OPTIONS[flag]
+                params.setdefault(block, {})[option] = new[flag]
+            if rc_call("options/set", params):
+                self._refresh_icon()
+                return "applied live"
+
+        self._remount()
+        return "remounted"
+
+    def _do_switch(self, name: str):
+        with self._lock:
+            if name == self.profile:
+                return
+            how = self._apply_profile(name)
+        self.icon.notify(f"Profile: {name} ({how})", "Rclone")
+
+    def _do_benchmark(self):
+        """Run the read and listing workloads against the mount under every profile."""
+        with self._lock:
+            original = self.profile
+            was_up   = is_rclone_running()
+            lines    = [f"Rclone profile benchmark — {time.strftime('%Y-%m-%d %H:%M')}", ""]
+            # Every profile gets an empty VFS cache dir — with --vfs-cache-mode full the
+            # normal cache survives a remount and the read test would measure local disk
+            cache_root = tempfile.mkdtemp(prefix="rclone-bench-")
+            try:
+                for name in MOUNT_PROFILES:
+                    lines.append(f"[{name}]")
+                    try:
+                        # Fresh mount and cache per profile so nothing carries over
+                        self.profile = name
+                        self._remount(os.path.join(cache_root, name))
+                        self._set_busy()
+                        self.icon.title = f"Rclone: Benchmarking {name}…"
+                        if not os.path.isdir(MOUNT_POINT + "\\"):
+                            lines += ["  mount did not come up", ""]
+                            continue
+                        lines += [
+                            f"  sequential read:   {bench_sequential_read(BENCH_FILE, BENCH_READ_MB)}",
+                            f"  directory listing: {bench_dir_listing(BENCH_DIR)}",
+                            "",
+                        ]
+                    except Exception as e:
+                        # I/O errors and timeouts on the mount shouldn't abort the whole run
+                        lines += [f"  error: {e}", ""]
+            finally:
+                self.profile = original
+                self.icon.update_menu()
+                if was_up:
+                    self._remount()
+                else:
+                    stop_rclone()
+                    self._refresh_icon()
+                shutil.rmtree(cache_root, ignore_errors=True)
+
+        try:
+            with open(BENCH_RESULTS, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+            self.icon.notify(f"Results saved to {BENCH_RESULTS}", "Rclone benchmark done")
+        except OSError:
+            self.icon.notify("Could not write results file", "Rclone benchmark done")
+
     def _toggle(self, icon=None, item=None):
         threading.Thread(target=self._toggle_worker, daemon=True).start()
 
@@ -170,6 +451,17 @@ class RcloneTray:
     def _menu_stop(self, icon=None, item=None):
         threading.Thread(target=self._do_stop, daemon=True).start()
 
+    def _menu_profile(self, name: str):
+        def action(icon=None, item=None):
+            threading.Thread(target=self._do_switch, args=(name,), daemon=True).start()
+        return action
+
+    def _profile_checked(self, name: str):
+        return lambda item: self.profile == name
+
+    def _menu_benchmark(self, icon=None, item=None):
+        threading.Thread(target=self._do_benchmark, daemon=True).start()
+
     def _menu_exit(self, icon=None, item=None):
         self._stop_ev.set()
         self.icon.stop()
@@ -177,9 +469,11 @@ class RcloneTray:
     # ── Auto-detect loop (always-on — restarts rclone if it crashes) ──────────
 
     def _auto_detect(self):
-        # Wait for boot mount to finish before first check
-        self._stop_ev.wait(STARTUP_GRACE)
-        self._refresh_icon()
+        # The tray does the login mount itself — mount as soon as the network is up
+        wait_for_network(self._stop_ev)
+        if self._stop_ev.is_set():
+            return
+        self._do_start()
 
         while not self._stop_ev.wait(CHECK_INTERVAL):
             if not is_rclone_running():
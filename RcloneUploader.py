@@ -3,9 +3,13 @@ from tkinter import ttk, filedialog, simpledialog, messagebox
 import subprocess
 import threading
 import queue
+import heapq
+import random
+import time
 import sys
 import os
 import re
+from collections import deque
 
 try:
     import pystray
@@ -15,6 +19,63 @@ except ImportError:
     TRAY_AVAILABLE = False
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+#  Retry config — adjust to taste for long overnight batches
+# ─────────────────────────────────────────────────────────────────────────────
+
+MAX_ATTEMPTS      = 5     # per file, including the first try
+RETRY_BASE_DELAY  = 5     # seconds — doubles after every transient failure
+RETRY_MAX_DELAY   = 300   # cap on a single backoff
+GLOBAL_PAUSE_SECS = 900   # how long the whole queue pauses on auth/quota errors
+GLOBAL_MAX_PAUSES = 4     # consecutive pauses before the rest of the batch is failed
+ERROR_TAIL        = 20    # rclone error lines kept per attempt for classification
+
+# rclone exit codes that settle the question on their own — checked first
+EXIT_CODE_KINDS = {
+    3: ("permanent", "Directory not found"),
+    4: ("permanent", "File not found"),
+    8: ("global",    "Transfer limit reached"),
+}
+
+# HTTP status as it appears in backend errors, e.g. "googleapi: Error 403:" / "HTTP error 401"
+_STATUS = r"(?:error|status|code)[\s:]*"
+
+# (kind, reason, pattern) — checked in order against the error messages only
+# (path prefix stripped, see error_message), so file names can't trigger a match.
+#   transient → requeue the file with backoff, keep the rest of the queue moving
+#   global    → pause the whole queue, the failing file goes back to the front
+#   permanent → give up on this file straight away
+FAILURE_PATTERNS = [
+    ("transient", "Rate limited",        r"rateLimitExceeded|rate limit exceeded|too many requests"
+                                         rf"|{_STATUS}429\b"),
+    ("global",    "Quota exceeded",      r"quotaExceeded|quota (?:has been )?exceeded|dailyLimitExceeded"
+                                         rf"|insufficient storage|storage (?:is )?full|{_STATUS}507\b"),
+    ("global",    "Auth failed",         r"invalid_grant|couldn't fetch token|token (?:has )?(?:expired|been revoked)"
+                                         rf"|{_STATUS}401\b|\bunauthori[sz]ed\b"),
+    ("transient", "Server error",        rf"{_STATUS}5\d\d\b|internal server error|service unavailable"
+                                         r"|bad gateway"),
+    ("transient", "Network error",       r"i/o timeout|timed out|connection (?:reset|refused|closed)"
+                                         r"|broken pipe|unexpected EOF|no such host|network is unreachable"),
+    ("permanent", "Not found",           rf"object not found|directory not found|no such file|{_STATUS}404\b"),
+]
+
+# Exit codes that only hint at what went wrong — used when no pattern matched.
+# 1 also covers startup failures (e.g. an expired token) and uncategorised
+# transfer errors, so it must not short-circuit the patterns above.
+EXIT_CODE_HINTS = {
+    1: ("permanent", "Usage error"),
+    5: ("transient", "Temporary error"),
+    6: ("permanent", "Failed (no retry)"),
+    7: ("global",    "Fatal error"),
+}
+
+ERROR_LINE_RE = re.compile(r"\bERROR\b|Failed to")
+# "2024/01/01 12:00:00 ERROR : Movies/a.mkv: Failed to copy: <message>"
+FAILED_TO_RE  = re.compile(r"Failed to [\w ]+?:\s*(.*)$")
+ERROR_MSG_RE  = re.compile(r"\bERROR\s*:\s*(?:[^:]*:\s+)?(.*)$")
+ANSI_RE       = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  Helpers
 # ─────────────────────────────────────────────────────────────────────────────
@@ -99,6 +160,41 @@ def parse_rclone_progress(line):
     return None
 
 
+def error_message(line):
+    """Strip the timestamp, log level and file path from an rclone ERROR line."""
+    m = FAILED_TO_RE.search(line) or ERROR_MSG_RE.search(line)
+    return (m.group(1) if m else line).strip()
+
+
+def classify_failure(returncode, error_lines):
+    """
+    Decide what to do with a failed rclone run.
+    Returns (kind, reason) where kind is "transient", "global" or "permanent".
+    """
+    if returncode in EXIT_CODE_KINDS:
+        return EXIT_CODE_KINDS[returncode]
+
+    messages = [error_message(line) for line in error_lines]
+    text     = "\n".join(messages)
+    for kind, reason, pattern in FAILURE_PATTERNS:
+        if re.search(pattern, text, re.IGNORECASE):
+            return kind, reason
+
+    if returncode in EXIT_CODE_HINTS:
+        return EXIT_CODE_HINTS[returncode]
+
+    # Unknown failure — assume it's a blip and let the attempt limit bound it
+    if messages and messages[-1]:
+        return "transient", messages[-1][:60]
+    return "transient", f"rclone exit {returncode}"
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for the retry after `attempt` failures."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  Main App
 # ─────────────────────────────────────────────────────────────────────────────
@@ -115,6 +211,14 @@ class UploaderApp:
         self.current_proc   = None
         self.tray           = None
 
+        # Queue pause state — written by the worker, resume_ev set from the UI/tray
+        self.pause_until    = None
+        self.resume_ev      = threading.Event()
+        self.stop_ev        = threading.Event()   # set on exit — wakes any backoff/pause wait
+
+        # Attempt count per file as last reported by the worker (for the table)
+        self.tries          = [0] * len(files)
+
         # Maps file index → line number in the output Text widget (1-based)
         self.output_line_index = {}
 
@@ -142,9 +246,9 @@ class UploaderApp:
                  font=("Segoe UI", 9, "bold")).pack(anchor="w", **pad)
 
         # ── Per-file progress table ────────────────────────────────────────
-        cols   = ("file", "pct", "speed", "size", "eta", "status")
-        hdrs   = ("File",  "%",   "Speed", "Size", "ETA", "Status")
-        widths = (260,      55,    90,      80,     70,    110)
+        cols   = ("file", "pct", "speed", "size", "eta", "tries", "status")
+        hdrs   = ("File",  "%",   "Speed", "Size", "ETA", "Tries", "Status")
+        widths = (220,      50,    85,      75,     60,    45,      175)
 
         tbl_frame = tk.Frame(self.root)
         tbl_frame.pack(fill="x", padx=10)
@@ -164,11 +268,13 @@ class UploaderApp:
         self.tree.tag_configure("uploading", foreground="#e07b00")
         self.tree.tag_configure("done",      foreground="#007700")
         self.tree.tag_configure("cancelled", foreground="#cc0000")
+        self.tree.tag_configure("retrying",  foreground="#b8860b")
+        self.tree.tag_configure("failed",    foreground="#cc0000")
 
         self.tree_ids = []
         for f in self.files:
             iid = self.tree.insert("", "end",
-                                   values=(os.path.basename(f), "", "", "", "", "Pending"),
+                                   values=(os.path.basename(f), "", "", "", "", "", "Pending"),
                                    tags=("pending",))
             self.tree_ids.append(iid)
 
@@ -196,6 +302,10 @@ class UploaderApp:
                        command=self._toggle_log,
                        font=("Segoe UI", 9, "bold")).pack(side="left")
 
+        self.resume_btn = tk.Button(toggle_frame, text="Resume Queue", width=14,
+                                    state="disabled", command=self._resume_queue)
+        self.resume_btn.pack(side="right")
+
         self.log_frame = tk.Frame(self.root)
         self.log_frame.pack(fill="both", expand=True, padx=10, pady=(0, 6))
 
@@ -217,6 +327,7 @@ class UploaderApp:
         self.output.tag_configure("progress",  foreground="#00ff00")
         self.output.tag_configure("done_line", foreground="#32cd32")
         self.output.tag_configure("cancel_ln", foreground="#ff4444")
+        self.output.tag_configure("retry_ln",  foreground="#ffd700")
 
     def _toggle_log(self):
         if self.log_visible.get():
@@ -228,6 +339,9 @@ class UploaderApp:
 
     def _output_init_line(self, file_index):
         """Write the initial placeholder line for a file and record its line number."""
+        if file_index in self.output_line_index:
+            # Retried file — keep reusing its existing line
+            return
         filename = os.path.basename(self.files[file_index])
         label    = f"File {file_index + 1:>2}  {filename:<40}"
 
@@ -268,6 +382,7 @@ class UploaderApp:
         menu = pystray.Menu(
             pystray.MenuItem("Open Progress Window",  self._restore_window, default=True),
             pystray.MenuItem("Cancel Current File",   self._tray_cancel_current),
+            pystray.MenuItem("Resume Queue",          self._tray_resume),
             pystray.MenuItem("Exit",                  self._tray_exit),
         )
         self.tray = pystray.Icon(
@@ -287,7 +402,8 @@ class UploaderApp:
         self.root.lift()
 
     def _tray_cancel_current(self, icon=None, item=None):
-        if self.upload_done:
+        # Nothing to cancel while the queue is backing off or paused
+        if self.upload_done or self.current_proc is None:
             return
         self.cancel_current = True
         if self.current_proc:
@@ -296,6 +412,13 @@ class UploaderApp:
             except Exception:
                 pass
 
+    def _tray_resume(self, icon=None, item=None):
+        self.root.after(0, self._resume_queue)
+
+    def _resume_queue(self):
+        """Cut a global pause short — the worker retries the failing file first."""
+        self.resume_ev.set()
+
     def _tray_exit(self, icon=None, item=None):
         self.root.after(0, self._prompt_exit)
 
@@ -309,6 +432,8 @@ class UploaderApp:
 
     def _force_quit(self):
         self.cancel_current = True
+        self.stop_ev.set()
+        self.resume_ev.set()
         if self.current_proc:
             try:
                 self.current_proc.kill()
@@ -342,58 +467,156 @@ class UploaderApp:
         threading.Thread(target=self._upload_worker, daemon=True).start()
 
     def _upload_worker(self):
-        completed = 0
-        for i, filepath in enumerate(self.files):
-            filename   = os.path.basename(filepath)
-            self.q.put(("file_start", i, filename))
-
-            cmd = [
-                "rclone", self.mode,
-                filepath, self.destination,
-                "--progress", "--buffer-size", "1G", "--stats", "1s"
-            ]
-
-            proc = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-            )
-            self.current_proc = proc
-
-            last_speed = ""
-            last_size  = ""
-
-            for line in proc.stdout:
-                parsed = parse_rclone_progress(line)
-                if parsed:
-                    last_speed = parsed["speed"]
-                    last_size  = parsed["size"]
-                    self.q.put(("file_progress", i, parsed))
-                if self.cancel_current:
-                    proc.kill()
+        """
+        Upload every file, retrying transient failures with backoff.
+        Files waiting out a backoff are parked in a ready-time heap so the rest
+        of the queue keeps transferring, and take the next slot once they're
+        due; auth/quota errors pause the whole queue.
+        """
+        completed = failed = cancelled = skipped = 0
+        attempts  = [0] * len(self.files)
+        pauses    = 0
+
+        pending = deque(range(len(self.files)))  # files not yet tried, in order
+        backoff = []                             # (ready_at, order, file index)
+        order   = 0
+        probe   = None                           # file that hit a global error, tried first on resume
+
+        while (probe is not None or pending or backoff) and not self.stop_ev.is_set():
+            if self.pause_until is not None:
+                self.resume_ev.wait(max(0.0, self.pause_until - time.monotonic()))
+                self.resume_ev.clear()
+                self.pause_until = None
+                if self.stop_ev.is_set():
                     break
+                self.q.put(("queue_resumed",))
+
+            # A due retry goes ahead of untried files, so it runs close to its delay
+            if probe is not None:
+                i, probe = probe, None
+            elif backoff and backoff[0][0] <= time.monotonic():
+                _, _, i = heapq.heappop(backoff)
+            elif pending:
+                i = pending.popleft()
+            else:
+                # Everything left is backing off — wait until the earliest is due
+                self.stop_ev.wait(backoff[0][0] - time.monotonic())
+                continue
 
-            proc.wait()
-            self.current_proc = None
+            attempts[i] += 1
+            result, detail = self._run_rclone(i, attempts[i])
 
-            if self.cancel_current:
-                self.cancel_current = False
+            # GLOBAL_MAX_PAUSES counts consecutive global errors only
+            if result != "failed" or detail[0] != "global":
+                pauses = 0
+
+            if result == "done":
+                completed += 1
+                self.q.put(("file_done", i, *detail))
+                continue
+
+            if result == "cancelled":
+                cancelled += 1
                 self.q.put(("file_cancelled", i))
-                if i == len(self.files) - 1:
-                    self.q.put(("all_done", completed))
                 continue
 
-            completed += 1
-            self.q.put(("file_done", i, last_speed, last_size))
+            kind, reason = detail
+            if kind == "global":
+                pauses += 1
+                if pauses > GLOBAL_MAX_PAUSES:
+                    failed += 1
+                    self.q.put(("file_failed", i, attempts[i], reason))
+                    for j in list(pending) + [j for _, _, j in backoff]:
+                        if attempts[j]:
+                            failed += 1
+                            self.q.put(("file_failed", j, attempts[j], reason))
+                        else:
+                            skipped += 1
+                            self.q.put(("file_skipped", j, reason))
+                    break
+                # Not this file's fault — don't burn one of its attempts
+                attempts[i] -= 1
+                # First thing tried once resumed, to check the problem has cleared
+                probe = i
+                self.resume_ev.clear()
+                self.pause_until = time.monotonic() + GLOBAL_PAUSE_SECS
+                self.q.put(("queue_paused", i, reason, GLOBAL_PAUSE_SECS))
+
+            elif kind == "transient" and attempts[i] < MAX_ATTEMPTS:
+                delay = backoff_delay(attempts[i])
+                heapq.heappush(backoff, (time.monotonic() + delay, order, i))
+                order += 1
+                self.q.put(("file_retry", i, attempts[i], delay, reason))
+
+            else:
+                failed += 1
+                self.q.put(("file_failed", i, attempts[i], reason))
+
+        self.q.put(("all_done", completed, failed, cancelled, skipped))
+
+    def _run_rclone(self, i, attempt):
+        """
+        Run a single rclone attempt for file i.
+        Returns ("done", (speed, size)), ("cancelled", None) or ("failed", (kind, reason)).
+        """
+        filepath = self.files[i]
+        self.cancel_current = False
+        self.q.put(("file_start", i, os.path.basename(filepath), attempt))
+
+        # --retries 1: the scheduler above owns retries, rclone shouldn't repeat
+        # the whole transfer on its own before we get to classify the failure
+        cmd = [
+            "rclone", self.mode,
+            filepath, self.destination,
+            "--progress", "--buffer-size", "1G", "--stats", "1s",
+            "--retries", "1"
+        ]
+
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        )
+        self.current_proc = proc
+
+        last_speed = ""
+        last_size  = ""
+        errors     = deque(maxlen=ERROR_TAIL)
+
+        for line in proc.stdout:
+            parsed = parse_rclone_progress(line)
+            if parsed:
+                last_speed = parsed["speed"]
+                last_size  = parsed["size"]
+                self.q.put(("file_progress", i, parsed))
+            elif ERROR_LINE_RE.search(line):
+                errors.append(ANSI_RE.sub("", line).strip())
+            if self.cancel_current:
+                proc.kill()
+                break
 
-        self.q.put(("all_done", completed))
+        proc.wait()
+        self.current_proc = None
+
+        if self.cancel_current:
+            self.cancel_current = False
+            return "cancelled", None
+        if proc.returncode == 0:
+            return "done", (last_speed, last_size)
+        return "failed", classify_failure(proc.returncode, list(errors))
 
     # ── Queue polling ─────────────────────────────────────────────────────────
 
+    def _advance_overall(self):
+        """Count one more file as settled (done, failed or cancelled)."""
+        self.progress["value"] += 1
+        self.overall_var.set(
+            f"Overall: {int(self.progress['value'])} / {len(self.files)}")
+
     def _poll_queue(self):
         try:
             while True:
@@ -401,14 +624,17 @@ class UploaderApp:
                 kind = msg[0]
 
                 if kind == "file_start":
-                    _, i, filename = msg
+                    _, i, filename, attempt = msg
+                    self.tries[i] = attempt
                     # Table row
                     self.tree.item(self.tree_ids[i],
-                                   values=(filename, "—", "—", "—", "—", "Uploading…"),
+                                   values=(filename, "—", "—", "—", "—",
+                                           attempt, "Uploading…"),
                                    tags=("uploading",))
                     self.tree.see(self.tree_ids[i])
+                    retry_note = f" (try {attempt}/{MAX_ATTEMPTS})" if attempt > 1 else ""
                     self.status_var.set(
-                        f"Status: Uploading {i+1} of {len(self.files)}…")
+                        f"Status: Uploading {i+1} of {len(self.files)}{retry_note}…")
                     # Output box — create the line for this file
                     self._output_init_line(i)
 
@@ -420,7 +646,7 @@ class UploaderApp:
                                    values=(filename,
                                            p["pct"], p["speed"],
                                            p["size"], p["eta"],
-                                           "Uploading…"),
+                                           self.tries[i], "Uploading…"),
                                    tags=("uploading",))
                     # Update single line in output box
                     progress_str = (
@@ -435,11 +661,10 @@ class UploaderApp:
                     done_val = f"✓ Done  {size}  @ {speed}" if speed else "✓ Done"
                     # Table
                     self.tree.item(self.tree_ids[i],
-                                   values=(filename, "100%", speed, size, "—", done_val),
+                                   values=(filename, "100%", speed, size, "—",
+                                           self.tries[i], done_val),
                                    tags=("done",))
-                    self.progress["value"] = i + 1
-                    self.overall_var.set(
-                        f"Overall: {i+1} / {len(self.files)}")
+                    self._advance_overall()
                     # Output line — stamp as done
                     self._output_update_line(
                         i, f"✓  Done   {size}  @ {speed}", "done_line")
@@ -448,16 +673,85 @@ class UploaderApp:
                     _, i = msg
                     filename = os.path.basename(self.files[i])
                     self.tree.item(self.tree_ids[i],
-                                   values=(filename, "—", "—", "—", "—", "✗ Cancelled"),
+                                   values=(filename, "—", "—", "—", "—",
+                                           self.tries[i], "✗ Cancelled"),
                                    tags=("cancelled",))
                     self._output_update_line(i, "✗  Cancelled", "cancel_ln")
+                    self._advance_overall()
+
+                elif kind == "file_retry":
+                    _, i, attempt, delay, reason = msg
+                    filename = os.path.basename(self.files[i])
+                    self.tree.item(self.tree_ids[i],
+                                   values=(filename, "—", "—", "—", "—", attempt,
+                                           f"↻ {reason} — retry in ≥{delay:.0f}s"),
+                                   tags=("retrying",))
+                    self._output_update_line(
+                        i, f"↻  {reason}  (try {attempt}/{MAX_ATTEMPTS}, "
+                           f"retrying in ≥{delay:.0f}s)", "retry_ln")
+
+                elif kind == "file_failed":
+                    _, i, attempt, reason = msg
+                    filename = os.path.basename(self.files[i])
+                    self.tree.item(self.tree_ids[i],
+                                   values=(filename, "—", "—", "—", "—", attempt,
+                                           f"✗ {reason}"),
+                                   tags=("failed",))
+                    self._output_update_line(
+                        i, f"✗  Failed   {reason}  after {attempt} tries", "cancel_ln")
+                    self._advance_overall()
+
+                elif kind == "file_skipped":
+                    _, i, reason = msg
+                    filename = os.path.basename(self.files[i])
+                    self.tree.item(self.tree_ids[i],
+                                   values=(filename, "—", "—", "—", "—", 0,
+                                           f"✗ Not attempted ({reason})"),
+                                   tags=("failed",))
+                    self._output_init_line(i)
+                    self._output_update_line(
+                        i, f"✗  Not attempted   {reason}", "cancel_ln")
+                    self._advance_overall()
+
+                elif kind == "queue_paused":
+                    _, i, reason, secs = msg
+                    filename = os.path.basename(self.files[i])
+                    self.tree.item(self.tree_ids[i],
+                                   values=(filename, "—", "—", "—", "—",
+                                           self.tries[i], f"⏸ {reason}"),
+                                   tags=("retrying",))
+                    self._output_update_line(
+                        i, f"⏸  {reason} — queue paused", "retry_ln")
+                    self.status_var.set(
+                        f"Status: Paused — {reason}. Auto-resume in "
+                        f"{secs // 60} min, or press Resume Queue.")
+                    self.resume_btn.configure(state="normal")
+                    if self.tray:
+                        self.tray.icon  = make_tray_image("#ffa500")
+                        self.tray.title = f"Rclone Uploader - Paused ({reason})"
+
+                elif kind == "queue_resumed":
+                    self.resume_btn.configure(state="disabled")
+                    self.status_var.set("Status: Resuming queue…")
+                    if self.tray:
+                        self.tray.icon  = make_tray_image("#1e90ff")
+                        self.tray.title = "Rclone Uploader - Running"
 
                 elif kind == "all_done":
-                    _, completed = msg
+                    _, completed, failed, cancelled, skipped = msg
                     self.upload_done = True
+                    self.resume_btn.configure(state="disabled")
+                    extra = []
+                    if failed:
+                        extra.append(f"{failed} failed")
+                    if cancelled:
+                        extra.append(f"{cancelled} cancelled")
+                    if skipped:
+                        extra.append(f"{skipped} not attempted")
                     self.status_var.set(
                         f"Status: Finished — {self.msg} {completed} of "
                         f"{len(self.files)} file(s) to {self.destination}"
+                        + (f"  ({', '.join(extra)})" if extra else "")
                     )
                     if self.tray:
                         self.tray.icon  = make_tray_image("#32cd32")